@@ -1,10 +1,21 @@
 import os
+import asyncio
+import datetime
+import logging
+import sqlite3
+import textwrap
+import threading
+import time
+import typing_extensions
 import streamlit as st
-import requests
-import json
+import httpx
+import orjson
+import numpy as np
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+logger = logging.getLogger(__name__)
+
 # Page configuration
 st.set_page_config(
     page_title="AI News Insights", 
@@ -19,105 +30,431 @@ load_dotenv()
 SERPER_API_KEY = os.getenv("SERPER_API_KEY", "").strip()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "").strip()
 
+@st.cache_resource
+def configure_gemini():
+    """
+    Configure the Gemini SDK exactly once per process; Streamlit re-executes
+    this script on every rerun, so the global configure call must not re-run
+    with it
+    """
+    genai.configure(api_key=GEMINI_API_KEY)
+    return True
+
 # Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
+configure_gemini()
+
+_SERPER_HEADERS = {
+    'X-API-KEY': SERPER_API_KEY,
+    'Content-Type': 'application/json'
+}
+
+@st.cache_resource
+def get_serper_client():
+    """
+    Shared Serper HTTP client; one keep-alive HTTP/2 connection persists
+    across reruns, so repeat fetches skip the TCP+TLS handshake and future
+    concurrent calls can multiplex over it
+    """
+    return httpx.Client(http2=True, timeout=10.0, headers=_SERPER_HEADERS)
 
+@st.cache_data(ttl=600, max_entries=128)
 def fetch_news(topic: str):
     """
-    Fetch latest news using Serper API
+    Fetch latest news for a topic, cached per topic for 10 minutes.
+
+    Errors are raised rather than rendered here so that failed fetches are
+    never cached and error display stays on the caller
     """
     url = "https://google.serper.dev/news"
-    payload = json.dumps({
+    payload = orjson.dumps({
         "q": topic,
         "num": 5
     })
-    headers = {
-        'X-API-KEY': SERPER_API_KEY,
-        'Content-Type': 'application/json'
+
+    response = get_serper_client().post(url, content=payload)
+    response.raise_for_status()
+    news_data = orjson.loads(response.content)
+
+    # Extract relevant news information, dropping malformed or duplicate
+    # items so no Gemini call is spent on an empty or repeated prompt
+    news_results = []
+    seen = set()
+    for item in news_data.get('news', []):
+        title = item.get('title', '').strip()
+        snippet = item.get('snippet', '').strip()
+        link = item.get('link', '')
+        if not title or not snippet:
+            continue
+        key = link or title
+        if key in seen:
+            continue
+        seen.add(key)
+        news_results.append({
+            'title': title,
+            'snippet': snippet,
+            'link': link
+        })
+
+    return news_results
+
+# Cosine similarity above which two analysis keys are considered equivalent
+SEMANTIC_CACHE_THRESHOLD = 0.92
+
+# On-disk store for the semantic cache, so analyses survive restarts
+SEMANTIC_CACHE_DB = "gemini_cache.db"
+
+@st.cache_resource
+def get_semantic_cache():
+    """
+    Semantic cache shared across reruns and backed by sqlite so it survives
+    restarts. Embeddings are loaded once per process into a single (N, D)
+    float32 matrix, making each lookup one vectorised matmul; a lock keeps
+    concurrent writers safe.
+    """
+    conn = sqlite3.connect(SEMANTIC_CACHE_DB, check_same_thread=False)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS cache "
+        "(key TEXT, embedding BLOB, response TEXT, ts INTEGER)"
+    )
+    conn.commit()
+
+    vectors = []
+    responses = []
+    for blob, response in conn.execute("SELECT embedding, response FROM cache"):
+        vectors.append(np.frombuffer(blob, dtype=np.float32))
+        responses.append(tuple(orjson.loads(response)))
+    matrix = np.vstack(vectors) if vectors else None
+
+    return {
+        "conn": conn,
+        "matrix": matrix,
+        "responses": responses,
+        "lock": threading.Lock()
     }
-    
-    try:
-        response = requests.post(url, headers=headers, data=payload)
-        response.raise_for_status()
-        news_data = response.json()
-        
-        # Extract relevant news information
-        news_results = []
-        for item in news_data.get('news', []):
-            news_results.append({
-                'title': item.get('title', ''),
-                'snippet': item.get('snippet', ''),
-                'link': item.get('link', '')
-            })
-        
-        return news_results
-    
-    except requests.RequestException as e:
-        st.error(f"News Fetch Error: {e}")
-        return []
 
-def initialize_gemini_model():
+async def embed_cache_key(key: str):
+    """
+    Embed a cache key and normalise it to a unit vector
+    """
+    embedding = (await genai.embed_content_async(
+        model="models/text-embedding-004",
+        content=key
+    ))["embedding"]
+    vector = np.asarray(embedding, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+async def semantic_cache_lookup(key: str):
+    """
+    Return (embedding, cached response) for a key; the response is None
+    on a cache miss so the embedding can be reused when storing
+    """
+    cache = get_semantic_cache()
+    vector = await embed_cache_key(key)
+    with cache["lock"]:
+        if cache["matrix"] is not None:
+            scores = cache["matrix"] @ vector
+            best = int(np.argmax(scores))
+            if float(scores[best]) > SEMANTIC_CACHE_THRESHOLD:
+                return vector, cache["responses"][best]
+    return vector, None
+
+def semantic_cache_store(key, vector, response):
+    cache = get_semantic_cache()
+    with cache["lock"]:
+        cache["conn"].execute(
+            "INSERT INTO cache VALUES (?, ?, ?, ?)",
+            (
+                key,
+                vector.astype(np.float32).tobytes(),
+                orjson.dumps(list(response)).decode(),
+                int(time.time())
+            )
+        )
+        cache["conn"].commit()
+        cache["responses"].append(tuple(response))
+        if cache["matrix"] is None:
+            cache["matrix"] = vector[np.newaxis, :]
+        else:
+            cache["matrix"] = np.vstack([cache["matrix"], vector])
+
+# Rebuild the model comfortably before the context cache's 1h TTL lapses
+CONTEXT_CACHE_REFRESH_SECONDS = 3300
+
+@st.cache_resource
+def _gemini_model_state(system_instruction):
+    """
+    Mutable per-prefix holder for the Gemini model, so an expiring context
+    cache can be swapped out in place across reruns
+    """
+    return {"model": None, "expires_at": 0.0, "lock": threading.Lock()}
+
+def initialize_gemini_model(system_instruction):
+    """
+    Return the Gemini model for an instruction prefix, backed by an explicit
+    context cache. The CachedContent expires after 1h, so the model is
+    recreated shortly before that rather than held for the process lifetime
+    """
+    state = _gemini_model_state(system_instruction)
+    with state["lock"]:
+        if state["model"] is None or time.time() >= state["expires_at"]:
+            try:
+                gemini_cache = genai.caching.CachedContent.create(
+                    model="models/gemini-1.5-flash-002",
+                    system_instruction=system_instruction,
+                    ttl=datetime.timedelta(hours=1)
+                )
+                state["model"] = genai.GenerativeModel.from_cached_content(
+                    cached_content=gemini_cache,
+                    generation_config={"temperature": 0.4}
+                )
+                state["expires_at"] = time.time() + CONTEXT_CACHE_REFRESH_SECONDS
+            except Exception:
+                # Context caching unavailable (e.g. the prefix is below the
+                # minimum cacheable size) - send the instructions inline on
+                # every call instead; this model never expires. Logged so a
+                # client-side error here is visible rather than silent
+                logger.warning(
+                    "Context cache creation failed; falling back to inline "
+                    "system instructions", exc_info=True
+                )
+                state["model"] = genai.GenerativeModel(
+                    'gemini-1.5-flash-002',
+                    system_instruction=system_instruction,
+                    generation_config={"temperature": 0.4}
+                )
+                state["expires_at"] = float("inf")
+        return state["model"]
+
+# Prompt templates, built once at import time. The static instruction block
+# comes first and the variable data last, keeping the prompt prefix stable
+# for Gemini's prefix caching.
+SYSTEM_INSTRUCTION_TEMPLATE = textwrap.dedent("""\
+    You are a {role} with the goal of {goal}.
+    Backstory: {backstory}
+
+    You will be given a numbered list of news items. Analyze every item as follows.
+
+    Research Objectives:
+    - Identify key themes and underlying narratives
+    - Provide context and historical background
+    - Highlight potential implications
+    - Maintain an objective, analytical approach
+
+    Insight Guidelines:
+    - Craft a nuanced, professional insight grounded in your research
+    - Maintain objectivity
+    - Aim for 300-350 characters
+    - Provoke thoughtful reflection
+    - Include a subtle, relevant perspective
+
+    Respond ONLY as a strict JSON array with one {{"research": str, "insight": str}}
+    object per news item, in the same order as the items.""")
+
+BATCH_PROMPT_TEMPLATE = "Analyze the following news items:\n\n{items}"
+
+NEWS_ITEM_TEMPLATE = "Item {idx}:\nTitle: {title}\nSnippet: {snippet}"
+
+# Output budget per article: ~600 tokens of research plus ~150 for the
+# insight and JSON scaffolding. The batched call scales this by item count.
+MAX_OUTPUT_TOKENS_PER_ARTICLE = 750
+
+class ArticleAnalysis(typing_extensions.TypedDict):
+    """Schema for one element of the batched Gemini response"""
+    research: str
+    insight: str
+
+class _JSONArrayStream:
     """
-    Initialize and return the Gemini model
+    Incrementally extracts completed top-level objects from a streamed JSON
+    array, so each element can be consumed before the array is closed
     """
-    return genai.GenerativeModel('gemini-pro')
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._start = None
+
+    def feed(self, text):
+        """
+        Append a chunk and return the objects completed by it
+        """
+        self._buffer += text
+        completed = []
+        for i in range(self._pos, len(self._buffer)):
+            ch = self._buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == '\\':
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == '{':
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.append(orjson.loads(self._buffer[self._start:i + 1]))
+        self._pos = len(self._buffer)
+        return completed
 
 class NewsAgent:
     def __init__(self, role, goal, backstory):
         self.role = role
         self.goal = goal
         self.backstory = backstory
-        self.model = initialize_gemini_model()
+        self.system_instruction = self._system_instruction()
 
-    def research_news(self, topic):
+    def _system_instruction(self):
         """
-        Perform in-depth research on the news topic
+        Build the static instruction prefix shared by every analysis call
         """
-        prompt = f"""As a {self.role} with the goal of {self.goal}, 
-        conduct a comprehensive research analysis on the topic: {topic}
-        
-        Research Objectives:
-        - Identify key themes and underlying narratives
-        - Provide context and historical background
-        - Highlight potential implications
-        - Maintain an objective, analytical approach
-        
-        Deliver a well-structured research summary."""
-        
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            st.error(f"Research Generation Error: {e}")
-            return f"Comprehensive research on {topic} could not be generated."
-
-    def generate_insight(self, news_item, research_context):
+        return SYSTEM_INSTRUCTION_TEMPLATE.format(
+            role=self.role,
+            goal=self.goal,
+            backstory=self.backstory
+        )
+
+    @classmethod
+    def _model(cls, system_instruction):
+        """
+        One Gemini model per distinct instruction prefix, shared lazily
+        across all agent instances. Deliberately uncached so an expired
+        context cache can be replaced by initialize_gemini_model
         """
-        Generate a professional insight with deep analysis
+        return initialize_gemini_model(system_instruction)
+
+    async def batch_analyze(self, news_items):
         """
-        prompt = f"""As a {self.role}, create a professional, insightful analysis based on:
+        Research all news items and generate professional insights in a
+        single streamed Gemini call, yielding each analysis as soon as its
+        array element completes
+        """
+        item_lines = "\n\n".join(
+            NEWS_ITEM_TEMPLATE.format(
+                idx=idx, title=item['title'], snippet=item['snippet']
+            )
+            for idx, item in enumerate(news_items, 1)
+        )
+        prompt = BATCH_PROMPT_TEMPLATE.format(items=item_lines)
+
+        response = await self._model(self.system_instruction).generate_content_async(
+            prompt,
+            generation_config={
+                "response_mime_type": "application/json",
+                "response_schema": list[ArticleAnalysis],
+                "candidate_count": 1,
+                "max_output_tokens": MAX_OUTPUT_TOKENS_PER_ARTICLE * len(news_items)
+            },
+            stream=True
+        )
+        parser = _JSONArrayStream()
+        yielded = 0
+        async for chunk in response:
+            for analysis in parser.feed(chunk.text):
+                if yielded < len(news_items):
+                    yielded += 1
+                    yield analysis
+        if yielded != len(news_items):
+            raise ValueError(
+                f"Expected {len(news_items)} analyses, got {yielded}"
+            )
+
+async def process_articles(researcher, news_articles, on_result):
+    """
+    Analyze all articles, invoking on_result(idx, research, insight, error)
+    for each article as soon as its analysis is available.
+
+    Semantic-cache lookups run concurrently; articles that miss are then
+    batched into one streamed Gemini call, so cache hits render immediately
+    and generated analyses render one by one as the stream produces them.
+    on_result runs on the script thread, so it may render Streamlit elements.
+    """
+    try:
+        lookups = await asyncio.gather(*(
+            semantic_cache_lookup(article['title']) for article in news_articles
+        ))
+    except Exception:
+        # Embedding failure only disables the cache, not the analysis
+        lookups = [(None, None)] * len(news_articles)
+
+    misses = []
+    for idx, (vector, cached) in enumerate(lookups):
+        if cached is not None:
+            on_result(idx, cached[0], cached[1], None)
+        else:
+            misses.append(idx)
+
+    if not misses:
+        return
+
+    pending = list(misses)
+    try:
+        async for analysis in researcher.batch_analyze(
+                [news_articles[idx] for idx in misses]):
+            # Extract before popping so a malformed element still leaves its
+            # index in pending for the fallback loop below
+            research_context = analysis['research'].strip()
+            insight = analysis['insight'].strip()
+            idx = pending.pop(0)
+            if lookups[idx][0] is not None:
+                semantic_cache_store(
+                    news_articles[idx]['title'],
+                    lookups[idx][0],
+                    (research_context, insight)
+                )
+            on_result(idx, research_context, insight, None)
+    except Exception as e:
+        for idx in pending:
+            title = news_articles[idx]['title']
+            on_result(
+                idx,
+                f"Comprehensive research on {title} could not be generated.",
+                f"Insight on {title}: A nuanced perspective on recent developments.",
+                str(e)
+            )
 
-News Context:
-Title: {news_item['title']}
-Snippet: {news_item['snippet']}
+@st.cache_resource
+def get_researcher():
+    """
+    Shared NewsAgent instance; the agent is stateless with respect to
+    article content, so one per process is enough
+    """
+    return NewsAgent(
+        role='Senior News Analyst',
+        goal='Provide comprehensive and nuanced news analysis',
+        backstory='An experienced investigative journalist with expertise in global affairs and deep contextual understanding.'
+    )
+
+def render_article(container, idx, article, research_context, insight, error):
+    """
+    Render one article's details and analysis into its placeholder container
+    as a single markdown blob, so each article costs one frontend delta
+    instead of several
+    """
+    block = f"""**Article {idx}:**
+- **Title:** {article['title']}
+- **Snippet:** {article['snippet']}
+- **Source Link:** {article['link']}
+
+**🔬 Research Context {idx}:**
 
-Previous Research:
 {research_context}
 
-Guidelines:
-- Craft a nuanced, professional insight
-- Integrate research context
-- Maintain objectivity
-- Aim for 300-350 characters
-- Provoke thoughtful reflection
-- Include a subtle, relevant perspective"""
-        
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            st.error(f"Insight Generation Error: {e}")
-            return f"Insight on {news_item['title']}: A nuanced perspective on recent developments."
+**💡 Insight {idx}:** *{insight}*
+
+---
+"""
+    with container:
+        if error:
+            st.error(f"Insight Generation Error: {error}")
+        st.markdown(block, unsafe_allow_html=False)
 
 def add_sidebar():
     """Enhanced sidebar with detailed app information"""
@@ -150,12 +487,8 @@ def main():
     """)
     
     # Initialize Agents
-    researcher = NewsAgent(
-        role='Senior News Analyst',
-        goal='Provide comprehensive and nuanced news analysis',
-        backstory='An experienced investigative journalist with expertise in global affairs and deep contextual understanding.'
-    )
-    
+    researcher = get_researcher()
+
     # Topic input
     topic = st.text_input(
         "Enter a news topic", 
@@ -172,33 +505,28 @@ def main():
         with st.spinner("Searching for relevant news..."):
             try:
                 # Fetch news articles
-                news_articles = fetch_news(topic)
-                
+                try:
+                    news_articles = fetch_news(topic)
+                except httpx.HTTPError as e:
+                    st.error(f"News Fetch Error: {e}")
+                    return
+
                 if not news_articles:
                     st.warning("No news found. Try a different topic.")
                     return
-                
-                # Generate and display insights
+
+                # Generate and display insights, filling each article's
+                # placeholder as soon as its analysis is available
                 st.subheader("🔍 News Insights")
-                
-                for idx, article in enumerate(news_articles, 1):
-                    # Display news article details
-                    st.markdown(f"""
-                    **Article {idx}:**
-                    - **Title:** {article['title']}
-                    - **Snippet:** {article['snippet']}
-                    - **Source Link:** {article['link']}
-                    """)
-                    
-                    # Generate research context and insight
-                    research_context = researcher.research_news(article['title'])
-                    insight = researcher.generate_insight(article, research_context)
-                    
-                    # Display insights
-                    st.markdown(f"**🔬 Research Context {idx}:**")
-                    st.write(research_context)
-                    st.markdown(f"**💡 Insight {idx}:** *{insight}*")
-                    st.divider()
+                containers = [st.container() for _ in news_articles]
+
+                def on_result(idx, research_context, insight, error):
+                    render_article(
+                        containers[idx], idx + 1, news_articles[idx],
+                        research_context, insight, error
+                    )
+
+                asyncio.run(process_articles(researcher, news_articles, on_result))
             
             except Exception as e:
                 st.error(f"An unexpected error occurred: {e}")